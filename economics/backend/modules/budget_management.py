@@ -1,9 +1,96 @@
 import numpy as np
-import numpy_financial as npf
-import pandas as pd
-from scipy.optimize import fsolve
+from numba import njit
 import math
 
+
+@njit(cache=True)
+def _horner_npv(cfs, rate):
+    """NPV via Horner's method: one multiply and one add per period."""
+    npv = 0.0
+    inv = 1.0 / (1.0 + rate)
+    for k in range(cfs.size - 1, -1, -1):
+        npv = cfs[k] + npv * inv
+    return npv
+
+
+@njit(cache=True)
+def _irr_newton(cfs, guess=0.1, tol=1e-9, maxiter=50):
+    """
+    Newton-Raphson IRR; NPV and dNPV/dr evaluated in one fused pass.
+    Returns NaN if the derivative vanishes, the rate leaves (-1, inf) or it doesn't converge.
+    """
+    r = guess
+    n = cfs.size
+    for _ in range(maxiter):
+        if r <= -1.0:
+            return math.nan
+        f = 0.0
+        fp = 0.0
+        d = 1.0
+        inv = 1.0 / (1.0 + r)
+        for k in range(n):
+            term = cfs[k] * d
+            f += term
+            fp += k * term
+            d *= inv
+        if abs(f) < tol:
+            return r
+        # dNPV/dr = -sum(k * cf_k * d_k) / (1 + r); the common factor is applied once
+        fp *= -inv
+        if abs(fp) < 1e-14:
+            return math.nan
+        step = f / fp
+        r -= step
+        if abs(step) < tol:
+            return r
+    return math.nan
+
+
+@njit(cache=True)
+def _irr_bisect(cfs, lo=-0.99, hi=10.0, guess=0.1, tol=1e-12, maxiter=200, nscan=200):
+    """
+    Bisection IRR fallback on [lo, hi]; NaN if NPV doesn't change sign there.
+    [lo, hi] is first scanned in nscan steps (log-spaced in 1 + r) so that pairs of
+    roots are still bracketed; the sign change nearest guess is then bisected until
+    the bracket is narrower than tol relative to the rate.
+    """
+    log_lo = math.log(1.0 + lo)
+    log_step = (math.log(1.0 + hi) - log_lo) / nscan
+    best_lo = math.nan
+    best_hi = math.nan
+    r_prev = lo
+    f_prev = _horner_npv(cfs, r_prev)
+    for i in range(1, nscan + 1):
+        r_next = math.exp(log_lo + i * log_step) - 1.0
+        f_next = _horner_npv(cfs, r_next)
+        if f_prev * f_next <= 0:
+            distance = abs(0.5 * (r_prev + r_next) - guess)
+            if math.isnan(best_lo) or distance < abs(0.5 * (best_lo + best_hi) - guess):
+                best_lo = r_prev
+                best_hi = r_next
+        r_prev = r_next
+        f_prev = f_next
+    if math.isnan(best_lo):
+        return math.nan
+    
+    lo = best_lo
+    hi = best_hi
+    f_lo = _horner_npv(cfs, lo)
+    for _ in range(maxiter):
+        mid = 0.5 * (lo + hi)
+        if hi - lo < tol * (1.0 + abs(mid)):
+            return mid
+        f_mid = _horner_npv(cfs, mid)
+        if f_mid == 0.0:
+            return mid
+        if f_lo * f_mid < 0:
+            hi = mid
+        else:
+            lo = mid
+            f_lo = f_mid
+    return 0.5 * (lo + hi)
+
+
 class BudgetManagementService:
     """
     Provides services for financial calculations and budget management.
@@ -12,42 +99,53 @@ class BudgetManagementService:
         self.default_discount_rate = 0.10
         
     def calculate_npv(self, cash_flows, discount_rate):
-        """Calculate Net Present Value"""
-        npv = 0
-        for t, cash_flow in enumerate(cash_flows):
-            npv += cash_flow / ((1 + discount_rate) ** t)
-        return npv
+        """Calculate Net Present Value (Horner's method, no pow per period)"""
+        return _horner_npv(np.asarray(cash_flows, dtype=np.float64), discount_rate)
+    
+    def _solve_irr(self, cfs, max_iterations=1000):
+        """Raw IRR root of a float64 cash flow array; NaN when no root is found"""
+        if not cfs.any():
+            return math.nan  # Every rate is a root; IRR is undefined
+        
+        # Initial guess
+        irr = _irr_newton(cfs, 0.1, 1e-9, max_iterations)
+        if math.isnan(irr):
+            irr = _irr_bisect(cfs)
+        return irr
     
     def calculate_irr(self, cash_flows, max_iterations=1000):
-        """Calculate Internal Rate of Return using Newton-Raphson method"""
-        def npv_function(rate):
-            return sum(cf / ((1 + rate) ** t) for t, cf in enumerate(cash_flows))
+        """Calculate Internal Rate of Return using Newton-Raphson, falling back to bisection"""
+        cfs = np.ascontiguousarray(cash_flows, dtype=np.float64)
+        irr = self._solve_irr(cfs, max_iterations)
         
-        try:
-            # Initial guess
-            irr = fsolve(npv_function, 0.1)[0]
-            
-            # Validate the result
-            if abs(npv_function(irr)) < 1e-6 and -0.99 < irr < 10:
-                return irr
-            else:
-                return None
-        except:
+        if not -0.99 < irr < 10:  # NaN fails this check too
+            return None
+        
+        # Validate the residual relative to the size of the discounted cash flows,
+        # so large amounts aren't rejected for floating-point rounding
+        scale = max(1.0, _horner_npv(np.abs(cfs), irr))
+        if abs(_horner_npv(cfs, irr)) < 1e-6 * scale:
+            return irr
+        else:
             return None
     
     def calculate_payback_period(self, initial_investment, cash_flows):
         """Calculate Payback Period"""
-        cumulative_cash_flow = -abs(initial_investment)
+        flows = np.array(cash_flows, dtype=np.float64)
+        if flows.size < 2:
+            return None
+        flows[0] = -abs(initial_investment)  # Replace initial investment slot
+        cumulative = np.cumsum(flows)
         
-        for month, cash_flow in enumerate(cash_flows[1:], 1):  # Skip initial investment
-            cumulative_cash_flow += cash_flow
-            if cumulative_cash_flow >= 0:
-                # Linear interpolation for exact payback period
-                previous_cumulative = cumulative_cash_flow - cash_flow
-                fraction = abs(previous_cumulative) / cash_flow
-                return month - 1 + fraction
+        # Cumulative flows need not be monotonic, so take the first crossing
+        reached = cumulative[1:] >= 0
+        if not reached.any():
+            return None  # Payback period not reached
+        month = int(reached.argmax()) + 1
         
-        return None  # Payback period not reached
+        # Linear interpolation for exact payback period
+        previous_cumulative = cumulative[month] - flows[month]
+        return month - 1 + float(abs(previous_cumulative) / flows[month])
     
     def calculate_roi(self, initial_investment, total_return):
         """Calculate Return on Investment"""
@@ -69,13 +167,12 @@ class BudgetManagementService:
         full_cash_flow = [initial_investment] + cash_flows
 
         # --- Net Present Value (NPV) ---
-        npv = npf.npv(discount_rate, full_cash_flow)
+        npv = self.calculate_npv(full_cash_flow, discount_rate)
 
         # --- Internal Rate of Return (IRR) ---
-        try:
-            irr = npf.irr(full_cash_flow)
-        except:
-            # IRR can fail to converge
+        # Report the raw root (no range/residual filter); None when the solver fails
+        irr = self._solve_irr(np.ascontiguousarray(full_cash_flow, dtype=np.float64))
+        if math.isnan(irr):
             irr = None
 
         # --- Return on Investment (ROI) ---
@@ -84,13 +181,10 @@ class BudgetManagementService:
 
         # --- Payback Period ---
         payback_period = None
-        cumulative_cash_flow = 0
-        for i, cash_flow in enumerate(full_cash_flow):
-            cumulative_cash_flow += cash_flow
-            if cumulative_cash_flow >= 0:
-                # Find the month where it turns positive
-                payback_period = i
-                break
+        reached = np.cumsum(full_cash_flow) >= 0
+        if reached.any():
+            # Find the month where it turns positive
+            payback_period = int(reached.argmax())
         
         return {
             'npv': round(npv, 2),
@@ -162,40 +256,56 @@ class BudgetManagementService:
             'risk_level': 'Low' if overall_score >= 2 else 'Medium' if overall_score >= 0 else 'High'
         }
     
-    def track_budget_variance(self, planned_budget, actual_costs):
+    def track_budget_variance(self, planned_budget, actual_costs, percent_complete=None):
         """
         Tracks budget variance across different project phases.
         planned_budget and actual_costs are dicts: {'phase': cost}
+        percent_complete is an optional dict: {'phase': 0-100}. Without it, phases
+        with recorded actual costs are treated as complete and the rest as not started.
         """
-        variance_analysis = {}
-        total_planned = sum(planned_budget.values())
+        phases = list(planned_budget)
+        n_phases = len(phases)
+        planned = np.fromiter((planned_budget[phase] for phase in phases), dtype=np.float64, count=n_phases)
+        actual = np.fromiter((actual_costs.get(phase, 0) for phase in phases), dtype=np.float64, count=n_phases)
+        total_planned = float(planned.sum())
         total_actual = sum(actual_costs.values())
 
-        for phase, planned_cost in planned_budget.items():
-            actual_cost = actual_costs.get(phase, 0)
-            variance = planned_cost - actual_cost
-            variance_percent = (variance / planned_cost * 100) if planned_cost > 0 else 0
-            
-            status = 'Under Budget'
-            if variance < 0:
-                status = 'Over Budget'
-            elif variance == 0:
-                status = 'On Budget'
-                
-            variance_analysis[phase] = {
+        variance = planned - actual
+        variance_percent = np.divide(variance * 100, planned, out=np.zeros(n_phases), where=planned > 0)
+        status = np.where(variance < 0, 'Over Budget',
+                          np.where(variance == 0, 'On Budget', 'Under Budget'))
+
+        variance_analysis = {
+            phase: {
                 'planned': planned_cost,
                 'actual': actual_cost,
-                'variance': variance,
-                'variance_percent': round(variance_percent, 2),
-                'status': status
+                'variance': phase_variance,
+                'variance_percent': round(phase_percent, 2),
+                'status': phase_status
             }
+            for phase, planned_cost, actual_cost, phase_variance, phase_percent, phase_status in zip(
+                phases, planned.tolist(), actual.tolist(), variance.tolist(),
+                variance_percent.tolist(), status.tolist())
+        }
             
         # Overall project performance
         total_variance = total_planned - total_actual
         total_variance_percent = (total_variance / total_planned * 100) if total_planned > 0 else 0
         
-        # Estimate at Completion (EAC) - simple version
-        eac = total_actual / (sum(actual_costs.values()) / total_planned) if total_planned > 0 and sum(actual_costs.values()) > 0 else total_planned
+        # Earned Value (EV): planned cost of the work performed so far
+        if percent_complete is not None:
+            completion = np.fromiter((percent_complete.get(phase, 0) for phase in phases),
+                                     dtype=np.float64, count=n_phases) / 100
+        else:
+            completion = np.fromiter((phase in actual_costs for phase in phases),
+                                     dtype=np.float64, count=n_phases)
+        earned_value = float(planned @ completion)
+        
+        # Estimate at Completion (EAC)
+        if percent_complete is not None and earned_value > 0:
+            eac = total_planned * total_actual / earned_value  # BAC x AC / EV
+        else:
+            eac = total_actual + (total_planned - earned_value)  # Remaining work at planned cost
 
         return {
             'phase_analysis': variance_analysis,
@@ -204,39 +314,46 @@ class BudgetManagementService:
                 'total_actual': total_actual,
                 'total_variance': round(total_variance, 2),
                 'total_variance_percent': round(total_variance_percent, 2),
+                'earned_value': round(earned_value, 2),
                 'estimate_at_completion': round(eac, 2)
             }
         }
     
     def forecast_cash_flow(self, initial_revenue, growth_rate, expenses, months):
         """Forecast future cash flows"""
-        forecast = []
-        current_revenue = initial_revenue
+        months = max(months, 0)  # A non-positive horizon yields an empty forecast
         
-        for month in range(1, months + 1):
-            # Apply growth rate
-            if month > 1:
-                current_revenue *= (1 + growth_rate / 12)  # Monthly growth
-            
-            # Calculate monthly expenses (can be fixed or variable)
-            if isinstance(expenses, dict):
-                monthly_expenses = sum(expenses.values())
-            else:
-                monthly_expenses = expenses
-            
-            net_cash_flow = current_revenue - monthly_expenses
-            
-            forecast.append({
+        # Calculate monthly expenses (can be fixed or variable)
+        if isinstance(expenses, dict):
+            monthly_expenses = sum(expenses.values())
+        else:
+            monthly_expenses = expenses
+        
+        # Revenue compounds monthly from the initial value: cumprod of [r0, g, g, ...]
+        revenue = np.full(months, 1 + growth_rate / 12, dtype=np.float64)  # Monthly growth
+        if months > 0:
+            revenue[0] = initial_revenue
+        np.cumprod(revenue, out=revenue)
+        net_cash_flow = revenue - monthly_expenses
+        cumulative_cash_flow = np.cumsum(net_cash_flow)
+        
+        expenses_rounded = round(monthly_expenses, 2)
+        forecast = [
+            {
                 'month': month,
-                'revenue': round(current_revenue, 2),
-                'expenses': round(monthly_expenses, 2),
-                'net_cash_flow': round(net_cash_flow, 2),
-                'cumulative_cash_flow': round(sum(item['net_cash_flow'] for item in forecast), 2)
-            })
+                'revenue': round(month_revenue, 2),
+                'expenses': expenses_rounded,
+                'net_cash_flow': round(month_net, 2),
+                'cumulative_cash_flow': round(month_cumulative, 2)
+            }
+            for month, month_revenue, month_net, month_cumulative in zip(
+                range(1, months + 1), revenue.tolist(), net_cash_flow.tolist(),
+                cumulative_cash_flow.tolist())
+        ]
         
         return {
             'forecast': forecast,
-            'total_revenue': round(sum(item['revenue'] for item in forecast), 2),
-            'total_expenses': round(sum(item['expenses'] for item in forecast), 2),
-            'total_net_cash_flow': round(sum(item['net_cash_flow'] for item in forecast), 2)
-        } 
\ No newline at end of file
+            'total_revenue': round(float(revenue.sum()), 2),
+            'total_expenses': round(monthly_expenses * months, 2),
+            'total_net_cash_flow': round(float(cumulative_cash_flow[-1]) if months > 0 else 0.0, 2)
+        }
\ No newline at end of file
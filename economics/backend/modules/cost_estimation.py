@@ -1,42 +1,85 @@
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
+import numba
+from numba import njit, prange
+from functools import lru_cache
 import math
 
+# The parallel batch kernel is called from FastAPI's threadpool, so it must run on a
+# thread-safe layer (tbb or omp). Numba's workqueue fallback aborts the process when
+# entered from two threads; with 'threadsafe' such a host fails at startup instead
+# (the kernel is first launched from CostEstimationService.__init__).
+numba.config.THREADING_LAYER = 'threadsafe'
+
+# Linear regression coefficients (intercept, loc_thousands, complexity_score).
+# Fitted once offline with CostEstimationService._train_linear_regression_model();
+# the training data uses a fixed seed, so these are deterministic.
+REGRESSION_INTERCEPT = -2056.6730135711114
+REGRESSION_COEFFICIENTS = (2004.4885086562583, 3363.065285019809)
+
+
+@njit(parallel=True, cache=True)
+def _batch_estimate_kernel(loc, fp, complexity, optimistic, most_likely, pessimistic,
+                           a, b, cost_per_fp, intercept, coef0, coef1):
+    """Runs every estimation method over columnar project arrays in parallel."""
+    n = loc.size
+    cocomo = np.empty(n)
+    function_points = np.empty(n)
+    expert = np.empty(n)
+    regression = np.empty(n)
+    final = np.empty(n)
+    for i in prange(n):
+        kloc = loc[i] * 1e-3
+        cocomo[i] = a * kloc ** b * 6000.0
+        function_points[i] = fp[i] * cost_per_fp
+        expert[i] = (optimistic[i] + 4.0 * most_likely[i] + pessimistic[i]) / 6.0
+        regression[i] = max(5000.0, intercept + kloc * coef0 + complexity[i] * coef1)
+        final[i] = (cocomo[i] + function_points[i] + expert[i] + regression[i]) / 4.0
+    return cocomo, function_points, expert, regression, final
+
 class CostEstimationService:
     """
     Provides services for estimating project costs using various models.
     """
     def __init__(self):
         """Initializes the service and sets up models."""
-        # COCOMO model coefficients
-        self.cocomo_coefficients = {
-            'organic': {'a': 2.4, 'b': 1.05},
-            'semi_detached': {'a': 3.0, 'b': 1.12},
-            'embedded': {'a': 3.6, 'b': 1.20}
+        # COCOMO model coefficients as (a, b)
+        self._cocomo = {
+            'organic': (2.4, 1.05),
+            'semi_detached': (3.0, 1.12),
+            'embedded': (3.6, 1.20)
         }
         
-        # Function Point weights (simplified)
-        self.fp_weights = {'simple': 3, 'average': 4, 'complex': 6}
+        # Cost per function point: weights (simple 3, average 4, complex 6) x €30 cost driver
+        self._fp_cost = {'simple': 90.0, 'average': 120.0, 'complex': 180.0}
+        
+        # Linear Regression Model (precomputed, see REGRESSION_COEFFICIENTS)
+        self._intercept = REGRESSION_INTERCEPT
+        self._coef = REGRESSION_COEFFICIENTS
         
-        # Linear Regression Model
-        self._regression_model = self._train_linear_regression_model()
+        # Repeated UI queries reuse results; inputs are bounded by the form's sliders
+        self._compare_core = lru_cache(maxsize=1024)(self._compare_methods)
+        
+        # Compile the batch kernel now so the first batch request doesn't pay for it
+        self.compare_batch({'loc': [8000], 'function_points': [350],
+                            'expert_estimates': [[20000, 25000, 40000]], 'complexity_score': [5]})
 
     def _train_linear_regression_model(self):
-        """Generates synthetic data and trains a simple regression model."""
+        """
+        Generates synthetic data and trains a simple regression model.
+        Only needed to regenerate REGRESSION_INTERCEPT/REGRESSION_COEFFICIENTS.
+        """
+        from sklearn.linear_model import LinearRegression
+
         np.random.seed(42)
         n_projects = 50
-        data = {
-            'loc_thousands': np.random.randint(5, 100, n_projects),
-            'complexity_score': np.random.uniform(1, 10, n_projects),
-        }
-        df = pd.DataFrame(data)
-        df['cost_euros'] = (df['loc_thousands'] * 2000 + 
-                            df['complexity_score'] * 3000 + 
-                            np.random.normal(0, 5000, n_projects))
+        loc_thousands = np.random.randint(5, 100, n_projects)
+        complexity_score = np.random.uniform(1, 10, n_projects)
+        cost_euros = (loc_thousands * 2000 + 
+                      complexity_score * 3000 + 
+                      np.random.normal(0, 5000, n_projects))
         
-        X = df[['loc_thousands', 'complexity_score']]
-        y = df['cost_euros']
+        X = np.column_stack([loc_thousands, complexity_score])
+        y = cost_euros
         model = LinearRegression()
         model.fit(X, y)
         return model
@@ -47,9 +90,9 @@ class CostEstimationService:
             return {'error': 'Lines of code must be positive.'}
             
         kloc = loc / 1000
-        coeffs = self.cocomo_coefficients.get(project_type, self.cocomo_coefficients['semi_detached'])
+        a, b = self._cocomo.get(project_type, self._cocomo['semi_detached'])
         
-        effort_pm = coeffs['a'] * (kloc ** coeffs['b'])
+        effort_pm = a * (kloc ** b)
         total_cost = effort_pm * 6000  # Assuming €6,000 per person-month
         
         return {
@@ -63,7 +106,7 @@ class CostEstimationService:
         if function_points <= 0:
             return {'error': 'Function points must be positive.'}
             
-        cost_per_fp = self.fp_weights.get(complexity, 4) * 30 # Simplified cost driver
+        cost_per_fp = self._fp_cost.get(complexity, self._fp_cost['average'])
         total_cost = function_points * cost_per_fp
         
         return {
@@ -88,8 +131,9 @@ class CostEstimationService:
     
     def calculate_linear_regression(self, loc_thousands, complexity_score):
         """Predicts cost using the trained linear regression model."""
-        input_data = np.array([[loc_thousands, complexity_score]])
-        predicted_cost = self._regression_model.predict(input_data)[0]
+        predicted_cost = (self._intercept
+                          + loc_thousands * self._coef[0]
+                          + complexity_score * self._coef[1])
         
         return {
             'method': 'Linear Regression',
@@ -98,18 +142,27 @@ class CostEstimationService:
 
     def compare_all_methods(self, project_data):
         """Compares results from all available estimation methods."""
-        results = {}
-        
         # Unpack data with defaults
         loc = project_data.get('loc', 8000)
         fp = project_data.get('function_points', 350)
         estimates = project_data.get('expert_estimates', [20000, 25000, 40000])
         complexity = project_data.get('complexity_score', 5)
 
+        # Normalize to a hashable key; non-list estimates are rejected by calculate_expert_judgment
+        estimates = tuple(estimates) if isinstance(estimates, list) else None
+        results = self._compare_core(loc, fp, estimates, complexity)
+
+        # Copy so callers can't mutate the cached entry
+        return {k: dict(v) if isinstance(v, dict) else v for k, v in results.items()}
+
+    def _compare_methods(self, loc, fp, estimates, complexity):
+        """Runs all models for one project; memoized per instance via _compare_core."""
+        results = {}
+        
         # Run all models
         results['cocomo'] = self.calculate_cocomo(loc)
         results['function_points'] = self.calculate_function_points(fp)
-        results['expert_judgment'] = self.calculate_expert_judgment(estimates)
+        results['expert_judgment'] = self.calculate_expert_judgment(list(estimates) if estimates is not None else None)
         results['linear_regression'] = self.calculate_linear_regression(loc / 1000, complexity)
         
         # Calculate a final weighted average
@@ -119,4 +172,37 @@ class CostEstimationService:
             final_estimate = np.mean(list(costs.values()))
             results['final_recommendation'] = round(final_estimate, 2)
 
-        return results 
\ No newline at end of file
+        return results
+
+    def compare_batch(self, batch_data):
+        """
+        Compares all estimation methods for many projects at once.
+        batch_data holds one list per field (columnar), e.g.
+        {'loc': [...], 'function_points': [...], 'expert_estimates': [[o, m, p], ...],
+         'complexity_score': [...]}
+        """
+        loc = np.asarray(batch_data['loc'], dtype=np.float64)
+        fp = np.asarray(batch_data['function_points'], dtype=np.float64)
+        estimates = np.asarray(batch_data['expert_estimates'], dtype=np.float64)
+        complexity = np.asarray(batch_data['complexity_score'], dtype=np.float64)
+        if estimates.size == 0:
+            estimates = estimates.reshape(0, 3)
+
+        n = loc.size
+        if fp.size != n or complexity.size != n or estimates.shape != (n, 3):
+            return {'error': 'All fields must have one entry per project; expert estimates need three values each.'}
+        if (loc <= 0).any():
+            return {'error': 'Lines of code must be positive.'}
+        if (fp <= 0).any():
+            return {'error': 'Function points must be positive.'}
+
+        a, b = self._cocomo['semi_detached']
+        columns = _batch_estimate_kernel(
+            loc, fp, complexity,
+            np.ascontiguousarray(estimates[:, 0]),
+            np.ascontiguousarray(estimates[:, 1]),
+            np.ascontiguousarray(estimates[:, 2]),
+            a, b, self._fp_cost['average'], self._intercept, self._coef[0], self._coef[1])
+
+        names = ('cocomo', 'function_points', 'expert_judgment', 'linear_regression', 'final_recommendation')
+        return {name: np.round(column, 2).tolist() for name, column in zip(names, columns)}